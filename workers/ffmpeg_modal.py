@@ -5,22 +5,54 @@ import logging
 import asyncio
 import httpx
 import aiofiles
-from PIL import Image
+import aiofiles.os
+import aioboto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+from PIL import Image, ImageOps
+from mutagen import File as MutagenFile
 import random
-from typing import List, Tuple, Dict, Optional, Any
-import io
+import functools
+import subprocess
+import shutil
+import uuid
+from collections import deque
+from typing import List, Tuple, Dict, Optional, Any, Awaitable, Callable
 import hashlib
 from datetime import datetime
 import time # Import time for accurate timing
 from pathlib import Path
 
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
+try:
+    import av
+except ImportError:
+    av = None
+
+try:
+    import numpy as np
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420
+    _turbo_jpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    # Python package or libturbojpeg shared library missing; use Pillow
+    _turbo_jpeg = None
+
 
 # ---- Quality Presets ----
 PRESETS = {
     "low": {
         "crf": 30,
-        "preset": "fast",
-        "tune": "film",
+        "fps": 24,
+        "cq": 28,             # NVENC constant-quality equivalent of crf
+        "preset": "veryfast",
+        "tune": "stillimage",   # Slideshow content, not grainy film
+        # 2s GOPs; synthetic pan/zoom never needs scene-cut detection
+        "x264_params": "keyint=48:min-keyint=24:scenecut=0",
         "profile": "baseline",
         "level": "3.0",
         "maxrate": "1M",
@@ -33,8 +65,12 @@ PRESETS = {
     },
     "medium": {
         "crf": 25,
+        "fps": 30,
+        "cq": 24,             # NVENC constant-quality equivalent of crf
         "preset": "medium",
-        "tune": "film",
+        "tune": "stillimage",
+        # Near-static frames gain little from umh search or a long lookahead
+        "x264_params": "keyint=60:min-keyint=30:scenecut=0:rc-lookahead=10:me=hex:subme=6",
         "profile": "main",
         "level": "3.1",
         "maxrate": "2M",
@@ -47,8 +83,11 @@ PRESETS = {
     },
     "high": {
         "crf": 18,
+        "fps": 30,
+        "cq": 19,             # NVENC constant-quality equivalent of crf
         "preset": "slow",
-        "tune": "film",
+        "tune": "stillimage",
+        "x264_params": "keyint=60:min-keyint=30:scenecut=0:rc-lookahead=20",
         "profile": "high",
         "level": "4.0",
         "maxrate": "5M",
@@ -61,52 +100,171 @@ PRESETS = {
     }
 }
 
+# Images are pre-scaled and padded to the largest zoom any effect reaches, so
+# zoompan only ever downsamples its crop window to the output size
+PRESCALE_FACTOR = 1.3
+
+# ---- Filter Templates ----
+# zoompan handles duration and final sizing internally. Motion follows a
+# cubic Hermite ease-in-out over the clip (0 -> 1 with zero slope at both
+# ends), which leaves less residual for the encoder than linear ramps. Pan
+# offsets are fractions of the input's free travel (iw-iw/zoom for
+# ken_burns' zoompan, iw-ow for the crop pans below), so speed is
+# independent of the pre-scale factor.
+_EASE = "(3*(on/{last})^2-2*(on/{last})^3)"
+_ZOOMPAN_OUT = ":d={frames}:s={width}x{height}:fps={fps}"
+
+# Constant-zoom pans skip zoompan's per-frame expression evaluation and
+# resampler setup: the still is looped to the clip length, a fixed-size
+# window slides across it with crop (x follows the same ease, indexed by
+# frame number n), and one scaler brings it to the output size. setpts alone
+# leaves the link at the demuxer's 25 fps, so a trailing fps (a no-op on
+# the already-spaced timestamps) declares the real rate
+_CROP_EASE = _EASE.replace("on/", "n/")
+_CROP_PAN = (
+    "loop=loop={last}:size=1:start=0,setpts=N/{fps}/TB,"
+    "crop=w=iw/1.2:h=ih/1.2:x='{x}':y=0,scale={width}:{height},fps={fps}"
+)
+
+_EFFECTS = {
+    "zoom_in": "zoompan=z='1+0.3*" + _EASE + "'" + _ZOOMPAN_OUT,
+    "zoom_out": "zoompan=z='1.3-0.3*" + _EASE + "'" + _ZOOMPAN_OUT,
+    "pan_left": _CROP_PAN.replace("{x}", "(iw-ow)*" + _CROP_EASE),
+    "pan_right": _CROP_PAN.replace("{x}", "(iw-ow)*(1-" + _CROP_EASE + ")"),
+    "ken_burns": (
+        "zoompan=z='1+0.2*" + _EASE + "':"
+        "x='(iw-iw/zoom)*" + _EASE + "':y='(ih-ih/zoom)*" + _EASE + "'"
+        + _ZOOMPAN_OUT
+    ),
+}
+
+# SAR normalization and PTS reset (pixel format is converted once after concat)
+_POST_FILTER = "setsar=1,setdar={width}/{height},setpts=PTS-STARTPTS[v{index}]"
+
+# Complete per-image chains, joined once at import time
+EFFECT_FILTER_TEMPLATES = {
+    name: f"[{{index}}:v]{effect},{_POST_FILTER}"
+    for name, effect in _EFFECTS.items()
+}
+
+# Burned-in subtitle style, written into the ASS header's styles
+SUBTITLE_STYLE = {
+    "Fontsize": "24",
+    "PrimaryColour": "&H00FFFFFF",
+    "OutlineColour": "&H00000000",
+    "Outline": "2",
+    "Alignment": "2",
+    "MarginV": "40",
+}
+
+# Bounding box for uploaded thumbnails (keeps aspect ratio)
+THUMBNAIL_SIZE = (320, 568)
+
 
 # ---- 1. Optimized Image with Minimal Dependencies ----
 image = (
     modal.Image.debian_slim()
-    .apt_install("ffmpeg")
-    .pip_install(
-        "Pillow",      # Lightweight image processing (50MB vs OpenCV's 150MB)
-        "httpx",       # Async HTTP client (5MB vs boto3's 60MB)
-        "aiofiles",    # Async file operations
-        "boto3",       # AWS SDK for R2 uploads
+    .apt_install("ffmpeg", "libturbojpeg0-dev")
+    # uv resolves and installs far faster than pip; exact pins keep the
+    # layer's definition stable so Modal reuses the cached build
+    .pip_install("uv==0.7.13")
+    .run_commands(
+        "uv pip install --system --compile-bytecode"
+        " Pillow==11.2.1"       # Lightweight image processing (wheels bundle libjpeg-turbo)
+        " PyTurboJPEG==1.7.7"   # Direct libjpeg-turbo SIMD encoder
+        " httpx==0.28.1"        # Async HTTP client (5MB vs boto3's 60MB)
+        " h2==4.2.0"            # HTTP/2 support for httpx
+        " aiofiles==24.1.0"     # Async file operations
+        " aioboto3==14.3.0"     # Async AWS SDK for R2 multipart uploads
+        " mutagen==1.47.0"      # Pure-Python audio header parsing
+        " uvloop==0.21.0"       # Faster event loop for asyncio I/O and subprocesses
+        " av==14.4.0"           # In-process libav probing, no ffprobe fork
     )
 )
 
+# GPU containers only mount the NVENC driver libraries when the "video"
+# capability is requested
+gpu_image = image.env({"NVIDIA_DRIVER_CAPABILITIES": "compute,utility,video"})
+
 app = modal.App("video-generator", image=image)
 logger = logging.getLogger("vidgenai.modal_worker")
 
+# Image cache shared across containers and jobs
+CACHE_MOUNT = "/cache"
+IMAGE_CACHE_DIR = os.path.join(CACHE_MOUNT, "images")
+image_cache = modal.Volume.from_name("img-cache", create_if_missing=True)
+
+# Small, re-read inputs (preprocessed images, subtitles/ASS) go on tmpfs when
+# it has room. tmpfs pages count against the container's memory limit, so
+# clips and the encoded output stay on disk
+SHM_DIR = "/dev/shm"
+SHM_MIN_FREE = 512 * 1024 * 1024
+
+# Audio is read straight from its URL; a stalled read fails after this many
+# seconds instead of hanging the job until the function timeout
+AUDIO_READ_TIMEOUT = 60
+
+# Audio durations already probed in this container, keyed by URL
+_audio_duration_cache: Dict[str, float] = {}
+
+# Bound concurrent uploads so bursts don't saturate the connection pool
+_upload_sem = asyncio.Semaphore(4)
+
+# R2 requires every multipart part except the last to be the same size,
+# which a fixed part size guarantees
+R2_PART_SIZE = 16 * 1024 * 1024
+R2_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=R2_PART_SIZE,
+    max_concurrency=8,
+    use_threads=True,
+)
+
 
 # ---- 2. R2 Upload Function ----
-async def upload_to_r2(file_path: str, object_key: str) -> str:
+# One client per container: building it loads botocore service models and
+# resolves the endpoint, which is too slow to repeat for every upload
+_r2_client: Any = None
+_r2_lock = asyncio.Lock()
+
+
+async def _get_r2_client() -> Any:
+    """Return the container-wide aioboto3 S3 client for R2, creating it once"""
+    global _r2_client
+    async with _r2_lock:
+        if _r2_client is None:
+            session = aioboto3.Session()
+            _r2_client = await session.client(
+                's3',
+                endpoint_url=os.environ["R2_ENDPOINT_URL"],
+                aws_access_key_id=os.environ["R2_ACCESS_KEY_ID"],
+                aws_secret_access_key=os.environ["R2_SECRET_ACCESS_KEY"],
+                region_name="auto",
+            ).__aenter__()
+    return _r2_client
+
+
+async def upload_to_r2(
+    file_path: str, object_key: str, metadata: Optional[Dict[str, str]] = None
+) -> str:
     # Configuration is loaded from Modal secrets
-    R2_ACCESS_KEY_ID = os.environ["R2_ACCESS_KEY_ID"]
-    R2_SECRET_ACCESS_KEY = os.environ["R2_SECRET_ACCESS_KEY"]
     R2_BUCKET_NAME = os.environ["R2_BUCKET_NAME"]
-    R2_ENDPOINT_URL = os.environ["R2_ENDPOINT_URL"]
     R2_PUBLIC_URL_BASE = os.environ["R2_PUBLIC_URL_BASE"]
 
     try:
-        if not os.path.exists(file_path):
+        if not await aiofiles.os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
 
-        # Import boto3 here to avoid issues with async
-        import boto3
-        
-        r2_client = boto3.client(
-            's3',
-            endpoint_url=R2_ENDPOINT_URL,
-            aws_access_key_id=R2_ACCESS_KEY_ID,
-            aws_secret_access_key=R2_SECRET_ACCESS_KEY,
-            region_name="auto",
-        )
-        r2_client.upload_file(
-            file_path,
-            R2_BUCKET_NAME,
-            object_key,
-            ExtraArgs={'ACL': 'public-read'}
-        )
+        r2_client = await _get_r2_client()
+        async with _upload_sem:
+            # Parts are uploaded concurrently once the file exceeds the threshold
+            await r2_client.upload_file(
+                file_path,
+                R2_BUCKET_NAME,
+                object_key,
+                ExtraArgs={'ACL': 'public-read', 'Metadata': metadata or {}},
+                Config=R2_TRANSFER_CONFIG
+            )
         url = f"{R2_PUBLIC_URL_BASE}/{object_key}"
         logger.info(f"Successfully uploaded {file_path} to {url}")
         return url
@@ -115,21 +273,156 @@ async def upload_to_r2(file_path: str, object_key: str) -> str:
         raise
 
 
+async def r2_head_object(object_key: str) -> Optional[Dict[str, str]]:
+    """HEAD an object in the R2 bucket; its user metadata, or None if missing"""
+    r2_client = await _get_r2_client()
+    try:
+        response = await r2_client.head_object(
+            Bucket=os.environ["R2_BUCKET_NAME"], Key=object_key
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return response.get("Metadata", {})
+
+
+async def upload_stream_to_r2(
+    reader: asyncio.StreamReader, object_key: str, producer_done: Awaitable[None],
+    metadata: Optional[Dict[str, str]] = None
+) -> str:
+    """Multipart-upload a byte stream of unknown length to R2.
+    
+    Parts are sent while the stream is still being produced. The upload is
+    only completed once producer_done resolves, and is aborted if it raises,
+    so a failed encode never leaves a truncated object behind.
+    """
+    R2_BUCKET_NAME = os.environ["R2_BUCKET_NAME"]
+    R2_PUBLIC_URL_BASE = os.environ["R2_PUBLIC_URL_BASE"]
+
+    r2_client = await _get_r2_client()
+    async with _upload_sem:
+        upload = await r2_client.create_multipart_upload(
+            Bucket=R2_BUCKET_NAME, Key=object_key,
+            ACL='public-read', ContentType='video/mp4', Metadata=metadata or {}
+        )
+        upload_id = upload["UploadId"]
+        part_sem = asyncio.Semaphore(4)
+        part_tasks = []
+        
+        async def upload_part(part_number: int, body: bytes) -> Dict[str, Any]:
+            try:
+                response = await r2_client.upload_part(
+                    Bucket=R2_BUCKET_NAME, Key=object_key, UploadId=upload_id,
+                    PartNumber=part_number, Body=body
+                )
+                return {"PartNumber": part_number, "ETag": response["ETag"]}
+            finally:
+                part_sem.release()
+        
+        try:
+            part_number = 1
+            while True:
+                try:
+                    body = await reader.readexactly(R2_PART_SIZE)
+                except asyncio.IncompleteReadError as e:
+                    body = e.partial
+                if not body:
+                    break
+                # Keep reading the pipe while earlier parts are in flight
+                await part_sem.acquire()
+                part_tasks.append(asyncio.create_task(upload_part(part_number, body)))
+                part_number += 1
+                if len(body) < R2_PART_SIZE:
+                    break
+            
+            parts = await asyncio.gather(*part_tasks)
+            await producer_done
+            await r2_client.complete_multipart_upload(
+                Bucket=R2_BUCKET_NAME, Key=object_key, UploadId=upload_id,
+                MultipartUpload={"Parts": parts}
+            )
+        except BaseException:
+            for task in part_tasks:
+                task.cancel()
+            await r2_client.abort_multipart_upload(
+                Bucket=R2_BUCKET_NAME, Key=object_key, UploadId=upload_id
+            )
+            raise
+    
+    url = f"{R2_PUBLIC_URL_BASE}/{object_key}"
+    logger.info(f"Successfully streamed upload to {url}")
+    return url
+
+
+def _apply_ass_style(ass_text: str, overrides: Dict[str, str]) -> str:
+    """Override fields of every Style line in an ASS script's [V4+ Styles]"""
+    lines = ass_text.splitlines()
+    fields: List[str] = []
+    for i, line in enumerate(lines):
+        if line.startswith("Format:") and not fields and "Fontsize" in line:
+            fields = [name.strip() for name in line[len("Format:"):].split(",")]
+        elif line.startswith("Style:") and fields:
+            values = line[len("Style:"):].split(",", len(fields) - 1)
+            for name, value in overrides.items():
+                if name in fields:
+                    values[fields.index(name)] = value
+            lines[i] = "Style: " + ",".join(v.strip() for v in values)
+    return "\n".join(lines) + "\n"
+
+
+# Receives a command's stdout reader and an awaitable for its exit status
+StdoutConsumer = Callable[[asyncio.StreamReader, Awaitable[None]], Awaitable[Any]]
+
+
 # ---- 3. Single-Pass Video Generation ----
 class SinglePassVideoGenerator:
+    # Thread counts for the 8-core container; override on the class or an
+    # instance when running many jobs per container (threads=1 each)
+    threads = 8
+    filter_threads = 8
+    filter_complex_threads = 4  # Complex graphs scale poorly past this
+    
     def __init__(self):
         pass
         
-    async def _run_command(self, cmd: List[str]) -> str:
+    async def _run_command(
+        self, cmd: List[str], stdout_consumer: Optional[StdoutConsumer] = None
+    ) -> None:
+        """Run a command, optionally handing its stdout to stdout_consumer.
+        
+        The consumer receives the stdout reader and an awaitable that raises
+        if the command fails.
+        """
         proc = await asyncio.create_subprocess_exec(
             *cmd,
-            stdout=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE if stdout_consumer else asyncio.subprocess.DEVNULL,
             stderr=asyncio.subprocess.PIPE
         )
-        stdout, stderr = await proc.communicate()
-        if proc.returncode != 0:
-            raise Exception(f"Command failed: {stderr.decode()}")
-        return stdout.decode()
+        
+        async def wait_for_exit() -> None:
+            # Keep only the tail of stderr instead of buffering the whole run
+            stderr_tail = deque(maxlen=50)
+            async for line in proc.stderr:
+                stderr_tail.append(line.decode(errors="replace"))
+            await proc.wait()
+            if proc.returncode != 0:
+                raise Exception(f"Command failed: {''.join(stderr_tail)}")
+        
+        if stdout_consumer is None:
+            await wait_for_exit()
+            return
+        
+        exit_task = asyncio.create_task(wait_for_exit())
+        try:
+            await stdout_consumer(proc.stdout, exit_task)
+            await exit_task
+        except BaseException:
+            # Don't leave the command blocked on a pipe nobody reads
+            if proc.returncode is None:
+                proc.kill()
+            exit_task.cancel()
+            raise
     
     def _get_video_dimensions(self, aspect_ratio: str, quality: str = "low") -> Tuple[int, int]:
         quality_preset = PRESETS.get(quality, PRESETS["low"])
@@ -138,59 +431,168 @@ class SinglePassVideoGenerator:
     
     def _build_effect_filter(
         self, index: int, duration: float, width: int, height: int, 
-        effect_type: str
+        effect_type: str, fps: int
     ) -> str:
         """Build effect filter for a single image"""
-        fps = 30
         frames = int(duration * fps)
-        
-        # Base scaling and padding - clean format
-        base_filter = (
-            f"[{index}:v]scale={width}:{height}:"
-            f"force_original_aspect_ratio=decrease,"
-            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black"
+        template = EFFECT_FILTER_TEMPLATES.get(
+            effect_type, EFFECT_FILTER_TEMPLATES["ken_burns"]
+        )
+        return template.format(
+            index=index, width=width, height=height, frames=frames, fps=fps,
+            last=max(frames - 1, 1)
         )
-        
-        # Add effect based on type - zoompan handles duration internally
-        if effect_type == "zoom_in":
-            effect = (
-                f"zoompan=z='min(zoom+0.0015,1.3)':"
-                f"d={frames}:s={width}x{height}:fps={fps}"
-            )
-        elif effect_type == "zoom_out":
-            effect = (
-                f"zoompan=z='if(eq(on,1),1.3,max(1.001,zoom-0.0015))':"
-                f"d={frames}:s={width}x{height}:fps={fps}"
-            )
-        elif effect_type == "pan_left":
-            effect = (
-                f"zoompan=z='1.2':x='if(gte(on,1),(on-1)*2,0)':"
-                f"d={frames}:s={width}x{height}:fps={fps}"
-            )
-        elif effect_type == "pan_right":
-            effect = (
-                f"zoompan=z='1.2':"
-                f"x='if(gte(on,1),iw-ow-(on-1)*2,iw-ow)':"
-                f"d={frames}:s={width}x{height}:fps={fps}"
-            )
-        else:  # ken_burns - combination
-            effect = (
-                f"zoompan=z='min(zoom+0.001,1.2)':"
-                f"x='if(gte(zoom,1.2),x+1,x)':y='if(gte(zoom,1.2),y+1,y)':"
-                f"d={frames}:s={width}x{height}:fps={fps}"
-            )
-        
-        # SAR normalization and pixel format fix
-        post_filter = f"setsar=1,setdar={width}/{height},format=yuv420p"
-        
-        # Combine all parts and set PTS
-        return f"{base_filter},{effect},{post_filter},setpts=PTS-STARTPTS[v{index}]"
+    
+    def _get_encoder_args(self, codec: str, quality_settings: Dict[str, Any]) -> List[str]:
+        """Build video encoder arguments; libx264 is the fallback"""
+        if codec == "svtav1":
+            return ["-c:v", "libsvtav1", "-preset", "10", "-crf", "30"]
+        if codec == "h264_nvenc":
+            return [
+                "-c:v", "h264_nvenc",
+                "-preset", "p4",
+                "-tune", "hq",
+                "-rc", "vbr",
+                "-cq", str(quality_settings["cq"]),
+                "-b:v", "0",
+                "-profile:v", quality_settings["profile"],
+                "-maxrate", quality_settings["maxrate"],
+                "-bufsize", quality_settings["bufsize"],
+            ]
+        # CPU-only libx264
+        return [
+            "-c:v", "libx264",
+            "-preset", quality_settings["preset"],
+            "-crf", str(quality_settings["crf"]),
+            "-tune", quality_settings["tune"],
+            "-x264-params", quality_settings["x264_params"],
+            "-profile:v", quality_settings["profile"],
+            "-level", quality_settings["level"],
+            "-maxrate", quality_settings["maxrate"],
+            "-bufsize", quality_settings["bufsize"],
+            "-threads", str(self.threads),
+        ]
     
     def _get_random_effect(self) -> str:
         """Get a random effect type"""
         effects = ["zoom_in", "zoom_out", "pan_left", "pan_right", "ken_burns"]
         return random.choice(effects)
     
+    def _build_image_filter(
+        self, index: int, duration: float, width: int, height: int,
+        fps: int
+    ) -> str:
+        """Build a random-effect chain for one image input, labelled [v{index}]"""
+        effect_type = self._get_random_effect()
+        return self._build_effect_filter(
+            index, duration, width, height, effect_type, fps
+        )
+    
+    async def _prepare_subtitles(self, subtitle_path: str) -> str:
+        """Convert SRT to ASS once with the burn-in style baked into the header"""
+        ass_path = os.path.splitext(subtitle_path)[0] + ".ass"
+        await self._run_command([
+            "ffmpeg", "-y", "-nostats", "-loglevel", "error",
+            "-i", subtitle_path, ass_path
+        ])
+        async with aiofiles.open(ass_path, "r", encoding="utf-8") as f:
+            ass_text = await f.read()
+        async with aiofiles.open(ass_path, "w", encoding="utf-8") as f:
+            await f.write(_apply_ass_style(ass_text, SUBTITLE_STYLE))
+        return ass_path
+    
+    def _build_subtitle_filter(self, ass_path: str) -> str:
+        """Burn in subtitles and convert to yuv420p once for the whole stream"""
+        return f"ass='{ass_path}',format=yuv420p"
+    
+    def _get_audio_input_args(self, audio_path: str) -> List[str]:
+        """Input options for the narration path or URL"""
+        if not audio_path.startswith(("http://", "https://")):
+            return ["-i", audio_path]
+        # A read error on a URL input looks like end of file to ffmpeg, and
+        # -shortest would then cut the video to the partial audio
+        return [
+            "-rw_timeout", str(AUDIO_READ_TIMEOUT * 1_000_000),
+            "-reconnect", "1",
+            "-reconnect_on_network_error", "1",
+            "-i", audio_path,
+        ]
+    
+    def _get_thumbnail_args(self, thumbnail_path: Optional[str]) -> List[str]:
+        """Extra output grabbing one downscaled frame of the first image"""
+        if thumbnail_path is None:
+            return []
+        max_w, max_h = THUMBNAIL_SIZE
+        return [
+            "-map", "0:v",
+            "-frames:v", "1",
+            "-vf", f"scale={max_w}:{max_h}:force_original_aspect_ratio=decrease",
+            "-q:v", "4",
+            thumbnail_path,
+        ]
+    
+    def _get_output_args(self, codec: str, quality: str, output_path: str) -> List[str]:
+        """Encoder, pixel format and audio settings for the final output"""
+        # Get quality preset settings
+        quality_settings = PRESETS.get(quality, PRESETS["low"])
+        
+        # Encoder settings with quality preset, at the preset's constant rate
+        args = self._get_encoder_args(codec, quality_settings)
+        args.extend([
+            "-pix_fmt", "yuv420p",
+            "-fps_mode", "cfr",
+            "-r", str(quality_settings["fps"]),
+        ])
+        
+        # Audio settings; AAC at the source sample rate, so no resampler
+        args.extend([
+            "-c:a", "aac",
+            "-b:a", "128k",
+            "-shortest",  # Match video length to shortest input
+            "-avoid_negative_ts", "make_zero",
+        ])
+        
+        if output_path == "pipe:1":
+            # A pipe can't be seeked back to write the moov atom, so emit
+            # fragmented MP4 that can be uploaded as it is produced
+            args.extend(["-f", "mp4", "-movflags", "+frag_keyframe+empty_moov"])
+        else:
+            # Move the moov atom to the front so playback from R2 can start
+            # before the whole file has been fetched
+            args.extend(["-movflags", "+faststart"])
+        args.append(output_path)
+        return args
+    
+    async def _render_clip(
+        self, img_path: str, duration: float, width: int, height: int,
+        fps: int, codec: str, clip_path: str
+    ) -> str:
+        """Render one image to a silent intermediate clip"""
+        filter_chain = self._build_image_filter(
+            0, duration, width, height, fps
+        )
+        cmd = [
+            # Clips render one per core, so decode, filters and encode each
+            # stay single-threaded instead of sizing pools to the host
+            "ffmpeg", "-y", "-nostats", "-loglevel", "error",
+            "-filter_complex_threads", "1",
+            "-threads", "1", "-i", img_path,
+            "-filter_complex", filter_chain,
+            "-map", "[v0]",
+            "-threads", "1",
+        ]
+        if codec == "h264_nvenc":
+            # Fastest NVENC preset at a near-lossless constant QP; the clip
+            # is re-encoded after concat anyway
+            cmd.extend(["-c:v", "h264_nvenc", "-preset", "p1", "-rc", "constqp", "-qp", "18"])
+        else:
+            cmd.extend(["-c:v", "libx264", "-preset", "ultrafast", "-crf", "18"])
+        # Pin the clip to the preset rate; setpts in the chains drops the
+        # rate zoompan declares, and the encoder would fall back to 25 fps
+        cmd.extend(["-pix_fmt", "yuv420p", "-r", str(fps), clip_path])
+        await self._run_command(cmd)
+        return clip_path
+    
     async def generate_video(
         self,
         image_paths: List[str],
@@ -200,149 +602,420 @@ class SinglePassVideoGenerator:
         output_path: str,
         video_aspect: str = "9:16",
         apply_effects: bool = True,
-        quality: str = "low"
+        quality: str = "low",
+        codec: str = "libx264",
+        parallel_clips: bool = True,
+        work_dir: Optional[str] = None,
+        stdout_consumer: Optional[StdoutConsumer] = None,
+        thumbnail_path: Optional[str] = None
     ) -> Tuple[str, float]:
-        """Generate video in a single FFmpeg pass"""
+        """Generate video from per-image clips, or in a single FFmpeg pass.
+        
+        Without effects every image is a static frame, so all of them are
+        fed through one filter chain as a single concat stream instead.
+        With output_path="pipe:1" the final video is written to stdout and
+        handed to stdout_consumer; work_dir then holds intermediate files.
+        If thumbnail_path is set, the same ffmpeg run also writes a small
+        JPEG of the first frame there.
+        """
         
         width, height = self._get_video_dimensions(video_aspect, quality)
+        work_dir = work_dir or os.path.dirname(output_path)
         
         print(f"Processing {len(image_paths)} images with durations: {durations}")
         
-        # Build FFmpeg command
-        cmd = ["ffmpeg", "-y"]
+        start_time = asyncio.get_event_loop().time()
+        subtitle_path = await self._prepare_subtitles(subtitle_path)
+        if not apply_effects:
+            await self._generate_slideshow(
+                image_paths, durations, audio_path, subtitle_path, output_path,
+                width, height, quality, codec,
+                work_dir, stdout_consumer, thumbnail_path
+            )
+        elif parallel_clips:
+            await self._generate_from_clips(
+                image_paths, durations, audio_path, subtitle_path, output_path,
+                width, height, quality, codec,
+                work_dir, stdout_consumer, thumbnail_path
+            )
+        else:
+            await self._generate_single_pass(
+                image_paths, durations, audio_path, subtitle_path, output_path,
+                width, height, quality, codec,
+                work_dir, stdout_consumer, thumbnail_path
+            )
+        duration = asyncio.get_event_loop().time() - start_time
+        
+        print(f"FFmpeg command completed in {duration:.2f} seconds")
+        
+        return output_path, duration
+    
+    async def _generate_slideshow(
+        self,
+        image_paths: List[str],
+        durations: List[float],
+        audio_path: str,
+        subtitle_path: str,
+        output_path: str,
+        width: int,
+        height: int,
+        quality: str,
+        codec: str,
+        work_dir: str,
+        stdout_consumer: Optional[StdoutConsumer],
+        thumbnail_path: Optional[str]
+    ) -> None:
+        """Encode static images as one concat stream through a single chain"""
+        fps = PRESETS.get(quality, PRESETS["low"])["fps"]
+        
+        # Images are already exactly WxH, so the concat demuxer can hold each
+        # one for its duration; the last entry is repeated because the
+        # demuxer ignores the final duration directive
+        list_path = os.path.join(work_dir, "images.txt")
+        entries = [
+            f"file '{path}'\nduration {duration:.6f}\n"
+            for path, duration in zip(image_paths, durations)
+        ]
+        entries.append(f"file '{image_paths[-1]}'\n")
+        async with aiofiles.open(list_path, "w") as f:
+            await f.write("".join(entries))
+        
+        # One chain for every image: fps turns the held frames into CFR output
+        video_filter = (
+            f"fps={fps},setsar=1,setdar={width}/{height},"
+            f"{self._build_subtitle_filter(subtitle_path)}"
+        )
+        cmd = [
+            "ffmpeg", "-y", "-nostats", "-loglevel", "error",
+            "-filter_threads", str(self.filter_threads),
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            *self._get_audio_input_args(audio_path),
+            "-vf", video_filter,
+            "-map", "0:v", "-map", "1:a",
+        ]
+        cmd.extend(self._get_output_args(codec, quality, output_path))
+        cmd.extend(self._get_thumbnail_args(thumbnail_path))
+        
+        print(f"Running FFmpeg slideshow command for {len(image_paths)} images")
+        await self._run_command(cmd, stdout_consumer)
+    
+    async def _generate_from_clips(
+        self,
+        image_paths: List[str],
+        durations: List[float],
+        audio_path: str,
+        subtitle_path: str,
+        output_path: str,
+        width: int,
+        height: int,
+        quality: str,
+        codec: str,
+        work_dir: str,
+        stdout_consumer: Optional[StdoutConsumer],
+        thumbnail_path: Optional[str]
+    ) -> None:
+        """Render clips in parallel, then concat + burn subtitles in one encode"""
+        fps = PRESETS.get(quality, PRESETS["low"])["fps"]
+        # One single-threaded clip encode per reserved core; cpu_count() sees
+        # the host's cores, not the container's reservation
+        sem = asyncio.Semaphore(self.threads)
+        
+        async def render(i: int, img_path: str, duration: float) -> str:
+            clip_path = os.path.join(work_dir, f"clip_{i:03d}.mp4")
+            async with sem:
+                return await self._render_clip(
+                    img_path, duration, width, height, fps, codec, clip_path
+                )
+        
+        clip_paths = await asyncio.gather(*(
+            render(i, img_path, duration)
+            for i, (img_path, duration) in enumerate(zip(image_paths, durations))
+        ))
+        print(f"Rendered {len(clip_paths)} clips")
+        
+        # Concat demuxer list
+        list_path = os.path.join(work_dir, "clips.txt")
+        async with aiofiles.open(list_path, "w") as f:
+            await f.write("".join(f"file '{path}'\n" for path in clip_paths))
+        
+        cmd = [
+            "ffmpeg", "-y", "-nostats", "-loglevel", "error",
+            "-filter_threads", str(self.filter_threads),
+        ]
+        if codec == "h264_nvenc":
+            # Decode the NVENC clips on NVDEC; frames come back to system
+            # memory for the CPU-only ass filter
+            cmd.extend(["-hwaccel", "cuda"])
+        cmd.extend([
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            *self._get_audio_input_args(audio_path),
+            "-vf", self._build_subtitle_filter(subtitle_path),
+            "-map", "0:v", "-map", "1:a",
+        ])
+        cmd.extend(self._get_output_args(codec, quality, output_path))
+        cmd.extend(self._get_thumbnail_args(thumbnail_path))
+        
+        print("Running FFmpeg concat command with", len(cmd), "arguments")
+        await self._run_command(cmd, stdout_consumer)
+    
+    def _build_concat_filters(self, count: int, group_size: int = 4) -> List[str]:
+        """Concat [v0]..[vN-1] into [outv], as a two-level tree past 8 segments"""
+        parts = []
+        labels = [f"[v{i}]" for i in range(count)]
+        
+        if count > 8:
+            groups = []
+            for g, start in enumerate(range(0, count, group_size)):
+                members = labels[start:start + group_size]
+                parts.append(
+                    f"{''.join(members)}concat=n={len(members)}:v=1:a=0[g{g}]"
+                )
+                groups.append(f"[g{g}]")
+            labels = groups
+        
+        parts.append(f"{''.join(labels)}concat=n={len(labels)}:v=1:a=0[outv]")
+        return parts
+    
+    async def _generate_single_pass(
+        self,
+        image_paths: List[str],
+        durations: List[float],
+        audio_path: str,
+        subtitle_path: str,
+        output_path: str,
+        width: int,
+        height: int,
+        quality: str,
+        codec: str,
+        work_dir: str,
+        stdout_consumer: Optional[StdoutConsumer],
+        thumbnail_path: Optional[str]
+    ) -> None:
+        """Generate video in a single FFmpeg pass"""
+        fps = PRESETS.get(quality, PRESETS["low"])["fps"]
+        
+        # Build FFmpeg command (errors only, no per-frame progress output)
+        cmd = ["ffmpeg", "-y", "-nostats", "-loglevel", "error"]
+        
+        # Thread the filters inside the graph, not just the encoder
+        cmd.extend([
+            "-filter_threads", str(self.filter_threads),
+            "-filter_complex_threads", str(self.filter_complex_threads),
+        ])
         
         # Add inputs WITHOUT loop flags - let filters handle duration
         filter_parts = []
         for i, (img_path, duration) in enumerate(zip(image_paths, durations)):
-            cmd.extend(["-i", img_path])  # Remove -loop 1 -t duration flags
+            cmd.extend(["-i", img_path])  # One frame; filters set the duration
             print(f"Added input {i}: {img_path} for {duration}s")
             
             # Build filter for this image
-            if apply_effects:
-                effect_type = self._get_random_effect()
-                filter_parts.append(
-                    self._build_effect_filter(
-                        i, duration, width, height, effect_type
-                    )
-                )
-            else:
-                # Simple scale and pad with duration
-                fps = 30
-                frames = int(duration * fps)
-                filter_parts.append(
-                    f"[{i}:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
-                    f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black,"
-                    f"loop=loop={frames}:size=1:start=0,"
-                    f"fps=30,setsar=1,setdar={width}/{height},format=yuv420p,"
-                    f"setpts=PTS-STARTPTS[v{i}]"
-                )
+            filter_parts.append(
+                self._build_image_filter(i, duration, width, height, fps)
+            )
         
-        # Add audio input
+        # Add audio input (local path or HTTP(S) URL)
         audio_index = len(image_paths)
-        cmd.extend(["-i", audio_path])
+        cmd.extend(self._get_audio_input_args(audio_path))
         
         # Build concatenation filter
-        concat_inputs = "".join([f"[v{i}]" for i in range(len(image_paths))])
-        concat_filter = (
-            f"{concat_inputs}concat=n={len(image_paths)}:v=1:a=0[outv]"
-        )
+        concat_filters = self._build_concat_filters(len(image_paths))
         print(f"Concatenating {len(image_paths)} video segments")
         
         # Add subtitles
-        subtitle_filter = (
-            f"[outv]subtitles='{subtitle_path}':force_style="
-            f"'Fontsize=24,PrimaryColour=&HFFFFFF&,OutlineColour=&H000000&,"
-            f"Outline=2,Alignment=2,MarginV=40'[final]"
-        )
+        subtitle_filter = f"[outv]{self._build_subtitle_filter(subtitle_path)}[final]"
         
         # Combine all filters
         filter_complex = ";".join(
-            filter_parts + [concat_filter, subtitle_filter]
+            filter_parts + concat_filters + [subtitle_filter]
         )
         
         print("Filter complex:", filter_complex[:200] + "..." if len(filter_complex) > 200 else filter_complex)
         
-        # Add filter complex to command
-        cmd.extend(["-filter_complex", filter_complex])
+        # Pass the graph via a script file so long slideshows can't exceed ARG_MAX
+        filter_script_path = os.path.join(work_dir, "filter_complex.txt")
+        async with aiofiles.open(filter_script_path, "w") as f:
+            await f.write(filter_complex)
+        cmd.extend(["-filter_complex_script", filter_script_path])
         
         # Map outputs
         cmd.extend(["-map", "[final]", "-map", f"{audio_index}:a"])
-        
-        # Get quality preset settings
-        quality_settings = PRESETS.get(quality, PRESETS["low"])
-        
-        # CPU-only output settings with quality preset
-        cmd.extend([
-            "-c:v", "libx264",
-            "-preset", quality_settings["preset"],
-            "-crf", str(quality_settings["crf"]),
-            "-tune", quality_settings["tune"],
-            "-profile:v", quality_settings["profile"],
-            "-level", quality_settings["level"],
-            "-maxrate", quality_settings["maxrate"],
-            "-bufsize", quality_settings["bufsize"],
-        ])
-        
-        # Audio settings
-        cmd.extend([
-            "-c:a", "aac",
-            "-b:a", "128k",
-            "-ar", "44100",
-            "-shortest",  # Match video length to shortest input
-            output_path
-        ])
+        cmd.extend(self._get_output_args(codec, quality, output_path))
+        cmd.extend(self._get_thumbnail_args(thumbnail_path))
         
         print("Running FFmpeg command with", len(cmd), "arguments")
         print("Command preview:", " ".join(cmd[:10]) + "...")
         
         # Run the command
-        start_time = asyncio.get_event_loop().time()
-        await self._run_command(cmd)
-        duration = asyncio.get_event_loop().time() - start_time
+        await self._run_command(cmd, stdout_consumer)
+
+
+# ---- 4. Optimized Image Preprocessing ----
+def _link_or_copy(src: str, dst: str) -> None:
+    """Hard-link src to dst, copying when they are on different filesystems"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _store_in_cache(path: str, cached_path: str) -> None:
+    """Copy a file into the cache atomically so concurrent writers never
+    expose a partial file"""
+    tmp_path = f"{cached_path}.{uuid.uuid4().hex}.tmp"
+    _link_or_copy(path, tmp_path)
+    os.replace(tmp_path, cached_path)
+
+
+def _save_jpeg(img: Image.Image, output_path: str) -> None:
+    """Encode an RGB image as a transient JPEG for FFmpeg.
+    
+    Quality 85 (the frame is re-encoded to H.264 anyway), no extra Huffman
+    pass, baseline, no metadata, and 4:2:0 chroma to match the yuv420p output.
+    """
+    if _turbo_jpeg is None:
+        img.save(
+            output_path, "JPEG", quality=85, optimize=False,
+            progressive=False, subsampling=2
+        )
+        return
+    
+    data = _turbo_jpeg.encode(
+        np.asarray(img), quality=85, pixel_format=TJPF_RGB, jpeg_subsample=TJSAMP_420
+    )
+    with open(output_path, "wb") as f:
+        f.write(data)
+
+
+def _fit_to_canvas(
+    source_path: str, content_type: str, target_size: Tuple[int, int],
+    output_path: str
+) -> bool:
+    """Letterbox a downloaded image onto the canvas; False if moved as-is"""
+    # Process with Pillow (more efficient than OpenCV for basic ops);
+    # open() only parses the header, pixels are decoded lazily
+    with Image.open(source_path) as img:
+        # RGB JPEGs already at the canvas size need no re-encode; anything
+        # else is normalised so every input FFmpeg sees has identical geometry
+        is_jpeg = img.format == "JPEG" and content_type.startswith("image/jpeg")
+        if is_jpeg and img.mode == 'RGB' and img.size == target_size:
+            img.close()
+            os.replace(source_path, output_path)
+            return False
         
-        print(f"FFmpeg command completed in {duration:.2f} seconds")
+        # Let libjpeg decode oversized JPEGs at 1/2, 1/4 or 1/8 scale (never
+        # below the canvas) instead of decoding full size and resampling
+        if img.format == "JPEG":
+            img.draft('RGB', target_size)
         
-        return output_path, duration
+        # Convert to RGB if necessary
+        frame = img.convert('RGB') if img.mode != 'RGB' else img
+        
+        # Fit and letterbox once here instead of per frame in FFmpeg
+        frame = ImageOps.pad(frame, target_size, Image.LANCZOS, color=(0, 0, 0))
+    
+    _save_jpeg(frame, output_path)
+    return True
 
 
-# ---- 4. Optimized Image Preprocessing ----
-async def preprocess_images(image_urls: List[str], temp_dir: str) -> List[str]:
-    """Download and preprocess images efficiently"""
+async def preprocess_images(
+    image_urls: List[str], temp_dir: str, frame_size: Tuple[int, int],
+    session: httpx.AsyncClient, scale_factor: float = PRESCALE_FACTOR
+) -> Tuple[List[str], bool]:
+    """Download and preprocess images efficiently.
+    
+    Also returns whether new entries were written to the image cache; the
+    caller commits them with _commit_image_cache when convenient.
+    """
+    
+    # Canvas matching the output aspect ratio; oversampled when zoom effects
+    # will crop into it
+    target_size = (
+        int(frame_size[0] * scale_factor), int(frame_size[1] * scale_factor)
+    )
+    
+    # Limit in-flight downloads to avoid head-of-line blocking on one host
+    sem = asyncio.Semaphore(8)
+    
+    # Preprocessed images persist across jobs in the Modal volume, keyed by
+    # source URL and canvas size
+    cache_dir = IMAGE_CACHE_DIR if os.path.isdir(CACHE_MOUNT) else None
+    if cache_dir is not None:
+        # A warm container only sees commits from before it started unless
+        # it reloads; pick up other containers' entries before any lookup
+        try:
+            await image_cache.reload.aio()
+        except Exception as e:
+            logger.warning(f"Image cache reload failed, using local view: {e}")
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Image cache unavailable: {e}")
+            cache_dir = None
+    new_cache_entries = []
+    
+    async def fetch_and_process(
+        session: httpx.AsyncClient, url: str, index: int, output_path: str
+    ) -> None:
+        # Stream the download to disk instead of buffering it in memory
+        source_path = os.path.join(temp_dir, f"src_{index:03d}")
+        async with session.stream("GET", url) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "")
+            async with aiofiles.open(source_path, "wb") as f:
+                async for chunk in response.aiter_bytes(1 << 16):
+                    await f.write(chunk)
+        
+        # Decode, letterbox and encode off the event loop so other downloads
+        # keep streaming while Pillow holds the CPU
+        reencoded = await asyncio.to_thread(
+            _fit_to_canvas, source_path, content_type, target_size, output_path
+        )
+        if reencoded:
+            await aiofiles.os.remove(source_path)
+            logger.info(f"Downloaded and processed image {index} from {url}")
+        else:
+            logger.info(f"Downloaded image {index} from {url} without re-encoding")
     
     async def download_and_process(
         session: httpx.AsyncClient, url: str, index: int
     ) -> Optional[str]:
-        try:
-            output_path = os.path.join(temp_dir, f"img_{index:03d}.jpg")
-            
-            # Download image
-            response = await session.get(url)
-            response.raise_for_status()
-            
-            # Process with Pillow (more efficient than OpenCV for basic ops)
-            img = Image.open(io.BytesIO(response.content))
-            
-            # Convert to RGB if necessary
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Save as optimized JPEG
-            img.save(output_path, "JPEG", quality=95, optimize=True)
+        async with sem:
+            try:
+                output_path = os.path.join(temp_dir, f"img_{index:03d}.jpg")
+                
+                cached_path = None
+                if cache_dir is not None:
+                    cache_key = f"{url}|{target_size[0]}x{target_size[1]}"
+                    key = hashlib.sha256(cache_key.encode()).hexdigest()[:16]
+                    cached_path = os.path.join(cache_dir, f"{key}.jpg")
+                    if await aiofiles.os.path.exists(cached_path):
+                        await asyncio.to_thread(_link_or_copy, cached_path, output_path)
+                        logger.info(f"Loaded image {index} from cache")
+                        return output_path
+                
+                await fetch_and_process(session, url, index, output_path)
+                
+            except Exception as e:
+                logger.error(f"Failed to process image {url}: {e}")
+                return None
             
-            logger.info(f"Downloaded and processed image {index} from {url}")
+            # The image is already usable; a failed cache write only costs
+            # future hits
+            if cached_path is not None:
+                try:
+                    await asyncio.to_thread(_store_in_cache, output_path, cached_path)
+                    new_cache_entries.append(cached_path)
+                except Exception as e:
+                    logger.warning(f"Failed to cache image {index}: {e}")
             return output_path
-            
-        except Exception as e:
-            logger.error(f"Failed to process image {url}: {e}")
-            return None
     
-    # Download all images concurrently
-    async with httpx.AsyncClient(timeout=30.0) as session:
-        tasks = [
-            download_and_process(session, url, i) 
-            for i, url in enumerate(image_urls)
-        ]
-        results = await asyncio.gather(*tasks)
+    # Download all images concurrently over the shared client
+    tasks = [
+        download_and_process(session, url, i) 
+        for i, url in enumerate(image_urls)
+    ]
+    results = await asyncio.gather(*tasks)
     
     # Filter out None values
     valid_paths = [path for path in results if path is not None]
@@ -350,7 +1023,121 @@ async def preprocess_images(image_urls: List[str], temp_dir: str) -> List[str]:
     if not valid_paths:
         raise Exception("No images could be downloaded")
     
-    return valid_paths
+    return valid_paths, bool(new_cache_entries)
+
+
+async def _commit_image_cache() -> None:
+    """Persist new image cache entries; a failure only costs future hits"""
+    try:
+        await image_cache.commit.aio()
+    except Exception as e:
+        logger.warning(f"Image cache commit failed: {e}")
+
+
+# One HTTP/2 client per container, so connections (and their TLS sessions)
+# to image and subtitle hosts survive across invocations
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the container-wide download client, creating it once"""
+    global _http_client
+    if _http_client is None:
+        limits = httpx.Limits(max_connections=50, max_keepalive_connections=50)
+        _http_client = httpx.AsyncClient(http2=True, limits=limits, timeout=60.0)
+    return _http_client
+
+
+async def download_file(client: httpx.AsyncClient, url: str, path: str) -> str:
+    """Stream a URL to a local path"""
+    # 1 MB chunks keep the number of aiofiles thread hops low without
+    # holding the whole body in memory
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        async with aiofiles.open(path, "wb") as f:
+            async for chunk in response.aiter_bytes(1 << 20):
+                await f.write(chunk)
+    return path
+
+
+def _probe_duration_av(audio_path: str) -> Optional[float]:
+    """Read a path/URL's duration in-process with PyAV; None if unknown"""
+    try:
+        with av.open(audio_path, timeout=30.0) as container:
+            if container.duration is not None:
+                return container.duration / av.time_base
+            stream = next(iter(container.streams.audio), None)
+            if stream is not None and stream.duration is not None:
+                return float(stream.duration * stream.time_base)
+    except av.error.FFmpegError as e:
+        logger.warning(f"PyAV probe failed for {audio_path}: {e}")
+    return None
+
+
+async def get_audio_duration(audio_path: str) -> float:
+    """Read audio duration from a local MP3 header, or probe a path/URL"""
+    if audio_path in _audio_duration_cache:
+        return _audio_duration_cache[audio_path]
+    
+    if not audio_path.startswith(("http://", "https://")):
+        audio_file = await asyncio.to_thread(MutagenFile, audio_path)
+        if audio_file is not None and audio_file.info is not None:
+            _audio_duration_cache[audio_path] = float(audio_file.info.length)
+            return _audio_duration_cache[audio_path]
+    
+    # libav in a worker thread avoids the ffprobe fork+exec; ffprobe stays
+    # as the fallback when PyAV is missing or can't open the source
+    if av is not None:
+        duration = await asyncio.to_thread(_probe_duration_av, audio_path)
+        if duration is not None:
+            _audio_duration_cache[audio_path] = duration
+            return duration
+    
+    # Audio stream duration first, container duration as a fallback
+    probe_cmd = ["ffprobe", "-v", "error"]
+    if audio_path.startswith(("http://", "https://")):
+        probe_cmd.extend(["-rw_timeout", str(AUDIO_READ_TIMEOUT * 1_000_000)])
+    probe_cmd.extend([
+        "-select_streams", "a:0",
+        "-show_entries", "stream=duration:format=duration",
+        "-of", "csv=p=0", audio_path
+    ])
+    # A one-shot blocking call in the default executor is cheaper than the
+    # asyncio subprocess transport for a probe this small. The overall
+    # timeout also covers a host that accepts the connection but trickles
+    loop = asyncio.get_running_loop()
+    stdout = await loop.run_in_executor(
+        None, functools.partial(
+            subprocess.check_output, probe_cmd, timeout=2 * AUDIO_READ_TIMEOUT
+        )
+    )
+    durations = [
+        line.strip() for line in stdout.decode().splitlines()
+        if line.strip() and line.strip() != "N/A"
+    ]
+    if not durations:
+        raise Exception(f"Could not determine audio duration for {audio_path}")
+    _audio_duration_cache[audio_path] = float(durations[0])
+    return _audio_duration_cache[audio_path]
+
+
+def _scratch_root() -> Optional[str]:
+    """tmpfs directory for per-job input files, or None for the default"""
+    try:
+        if shutil.disk_usage(SHM_DIR).free >= SHM_MIN_FREE:
+            return SHM_DIR
+    except OSError:
+        pass
+    return None
+
+
+async def _timed(step: str, coro, timings: Dict[str, float]) -> Any:
+    """Await a coroutine and record its wall time under timings[step]"""
+    start_time = time.time()
+    try:
+        return await coro
+    finally:
+        timings[step] = time.time() - start_time
 
 
 # ---- 5. Main Video Generation Function ----
@@ -361,149 +1148,222 @@ async def generate_optimized_video(
     script: str,
     video_aspect: str = "9:16",
     apply_effects: bool = True,
-    quality: str = "low"
+    quality: str = "low",
+    reuse_source_thumbnail: bool = True,
+    codec: str = "libx264",
+    stream_upload: bool = False,
+    reuse_existing: bool = False,
+    parallel_clips: bool = True
 ) -> Dict[str, Any]:
     """Main function to generate video with optimizations"""
     
     overall_start_time = time.time() # Start timing the entire process
     timings = {}
     
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Change to temp directory for simpler paths
-        original_cwd = os.getcwd()
-        os.chdir(temp_dir)
+    # Object keys for R2
+    if reuse_existing:
+        # Content-addressed keys: an identical request maps to the same
+        # objects, so a previous render can be returned without rebuilding
+        render_id = "|".join([
+            script, *image_urls, audio_url, subtitle_url,
+            video_aspect, str(apply_effects), quality, codec,
+        ])
+        render_hash = hashlib.blake2b(render_id.encode("utf-8"), digest_size=8).hexdigest()
+        video_key = f"videos/{render_hash}.mp4"
+        thumb_key = f"thumbnails/{render_hash}.jpg"
         
+        # Only an optimisation: any lookup error falls back to rendering
+        keys = [video_key] if reuse_source_thumbnail else [video_key, thumb_key]
         try:
-            # Download audio and subtitles concurrently
-            start_time = time.time()
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                print("Downloading audio and subtitles concurrently")
-                audio_response = await client.get(audio_url)
-                subtitle_response = await client.get(subtitle_url)
-                
-                audio_response.raise_for_status()
-                subtitle_response.raise_for_status()
-                
-                # Save files
-                audio_path = "audio.mp3"
-                subtitle_path = "subtitles.srt"
-                
-                async with aiofiles.open(audio_path, "wb") as f:
-                    await f.write(audio_response.content)
-                
-                async with aiofiles.open(subtitle_path, "wb") as f:
-                    await f.write(subtitle_response.content)
-            end_time = time.time()
-            timings["audio_subtitle_download"] = end_time - start_time
-            print("Downloaded audio and subtitles")
-            logger.info(f"Audio and subtitle download took {timings['audio_subtitle_download']:.2f} seconds")
-            
-            # Get audio duration
-            start_time = time.time()
-            probe_cmd = [
-                "ffprobe", "-v", "error", "-show_entries", 
-                "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", 
-                audio_path
-            ]
-            proc = await asyncio.create_subprocess_exec(
-                *probe_cmd, stdout=asyncio.subprocess.PIPE
+            heads = await _timed(
+                "r2_existing_check",
+                asyncio.gather(*(r2_head_object(key) for key in keys)), timings
             )
-            stdout, _ = await proc.communicate()
-            total_duration = float(stdout.decode().strip())
-            end_time = time.time()
-            timings["get_audio_duration"] = end_time - start_time
-            print("Got audio duration")
-            logger.info(f"Getting audio duration took {timings['get_audio_duration']:.2f} seconds")
-            
-            # Preprocess images
-            start_time = time.time()
-            image_paths = await preprocess_images(image_urls, temp_dir)
-            print("image_paths", image_paths)
-            end_time = time.time()
-            timings["image_preprocessing"] = end_time - start_time
-            print("Preprocessed images")
-            logger.info(f"Image preprocessing took {timings['image_preprocessing']:.2f} seconds")
-            
-            # Calculate duration per image
-            durations = [total_duration / len(image_paths)] * len(image_paths)
-            print("Calculated duration per image")
-            
-            # Generate video using single-pass approach
-            generator = SinglePassVideoGenerator()
-            video_path = "output.mp4"
-            
-            print("Generated video using single-pass approach")
-            
-            start_time = time.time()
-            _, generation_time = await generator.generate_video(
-                image_paths=image_paths,
-                durations=durations,
-                audio_path=audio_path,
-                subtitle_path=subtitle_path,
-                output_path=video_path,
-                video_aspect=video_aspect,
-                apply_effects=apply_effects,
-                quality=quality
-            )
-            end_time = time.time()
-            timings["video_generation"] = end_time - start_time
-            
-            print(f"Video generated in {generation_time:.2f} seconds")
-            logger.info(f"Video generation completed in {timings['video_generation']:.2f} seconds")
-            
-            # Use the first image as the thumbnail
-            thumbnail_path = image_paths[0]
-            
-            print("Using the first image as thumbnail")
-            
-            # Upload to R2
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            # Use deterministic hash for consistent naming
-            script_hash = hashlib.md5(script.encode()).hexdigest()[:8]
-            video_key = f"videos/{timestamp}_{script_hash}.mp4"
-            thumb_key = f"thumbnails/{timestamp}_{script_hash}.jpg"
-            
-            start_time = time.time()
-            video_url = await upload_to_r2(video_path, video_key)
-            end_time = time.time()
-            timings["video_upload_to_r2"] = end_time - start_time
-            
-            start_time = time.time()
-            thumb_url = await upload_to_r2(
-                thumbnail_path, thumb_key
-            )
-            end_time = time.time()
-            timings["thumbnail_upload_to_r2"] = end_time - start_time
-            
-            print("Video generated successfully")
-            logger.info("--- Video Generation Timings Summary ---")
-            for step, duration in timings.items():
-                logger.info(f"{step.replace('_', ' ').title()}: {duration:.2f} seconds")
-            logger.info("----------------------------------------")
-            
-            overall_end_time = time.time() # End timing the entire process
-            total_process_time = overall_end_time - overall_start_time
-            
-            # Calculate total generation time from all individual timings
-            total_video_generation_time = sum(timings.values())
-            
-            logger.info(f"Total process time: {total_process_time:.2f} seconds")
-            logger.info(f"Total effective video generation time (sum of steps): {total_video_generation_time:.2f} seconds")
-            
+        except Exception as e:
+            logger.warning(f"Existing render check failed, rendering anyway: {e}")
+            heads = [None]
+        
+        # A reused source thumbnail is whichever image downloaded first in
+        # the original render, recorded on the video object
+        video_meta = heads[0]
+        source_index = (video_meta or {}).get("source-thumbnail-index", "")
+        if all(head is not None for head in heads) and (
+            not reuse_source_thumbnail or source_index.isdigit()
+        ):
+            public_base = os.environ["R2_PUBLIC_URL_BASE"]
+            logger.info(f"Reusing existing render {video_key}")
+            total_process_time = time.time() - overall_start_time
             return {
                 "success": True,
-                "video_url": video_url,
-                "thumbnail_url": thumb_url,
-                "duration": total_duration,
-                "generation_time": generation_time,
-                "timings_summary": timings, # Include timings in the result
-                "total_process_time": total_process_time, # Total time for the entire function execution
-                "total_video_generation_time": total_video_generation_time # Sum of all individual timed steps
+                "video_url": f"{public_base}/{video_key}",
+                "thumbnail_url": (
+                    image_urls[int(source_index)] if reuse_source_thumbnail
+                    else f"{public_base}/{thumb_key}"
+                ),
+                "duration": await get_audio_duration(audio_url),
+                "generation_time": 0.0,
+                "reused": True,
+                "timings_summary": timings,
+                "total_process_time": total_process_time,
+                "total_video_generation_time": sum(timings.values())
             }
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
+        # Use deterministic hash for consistent naming
+        script_hash = hashlib.blake2b(script.encode("utf-8"), digest_size=4).hexdigest()
+        video_key = f"videos/{timestamp}_{script_hash}.mp4"
+        thumb_key = f"thumbnails/{timestamp}_{script_hash}.jpg"
+    
+    with tempfile.TemporaryDirectory() as temp_dir, \
+            tempfile.TemporaryDirectory(dir=_scratch_root()) as input_dir:
+        subtitle_path = os.path.join(input_dir, "subtitles.srt")
+        
+        generator = SinglePassVideoGenerator()
+        frame_size = generator._get_video_dimensions(video_aspect, quality)
+        scale_factor = PRESCALE_FACTOR if apply_effects else 1
+        
+        # Subtitles and images download in parallel with the duration probe.
+        # Audio is never saved locally: the duration probe (PyAV, or ffprobe
+        # as a fallback) and the final ffmpeg encode read it straight from
+        # its URL. Subtitles are downloaded because they are converted to a
+        # styled ASS file for the ass filter.
+        # The container-wide HTTP/2 client multiplexes every download over
+        # connections kept alive from earlier jobs
+        client = _get_http_client()
+        print("Downloading subtitles and images concurrently")
+        probe_task = asyncio.create_task(_timed(
+            "get_audio_duration", get_audio_duration(audio_url), timings
+        ))
+        subtitle_task = asyncio.create_task(_timed(
+            "subtitle_download", download_file(client, subtitle_url, subtitle_path), timings
+        ))
+        image_task = asyncio.create_task(_timed(
+            "image_preprocessing", preprocess_images(
+                image_urls, input_dir, frame_size, client, scale_factor
+            ), timings
+        ))
+        tasks = [probe_task, subtitle_task, image_task]
+        try:
+            await subtitle_task
+            image_paths, cache_updated = await image_task
+            total_duration = await probe_task
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        print("image_paths", image_paths)
+        
+        # Upload new cache entries to the volume alongside the encode
+        # instead of delaying it; awaited once the video is uploaded
+        cache_commit = (
+            asyncio.create_task(_commit_image_cache()) if cache_updated else None
+        )
+        for step in ("subtitle_download", "get_audio_duration", "image_preprocessing"):
+            logger.info(f"{step.replace('_', ' ').capitalize()} took {timings[step]:.2f} seconds")
+        
+        # Calculate duration per image
+        durations = [total_duration / len(image_paths)] * len(image_paths)
+        print("Calculated duration per image")
+        
+        # Use the first image as the thumbnail
+        video_metadata = {}
+        if reuse_source_thumbnail:
+            # Point at the source URL of the first downloaded image (img_NNN.jpg)
+            source_index = int(Path(image_paths[0]).stem.rsplit("_", 1)[1])
+            thumb_url = image_urls[source_index]
+            video_metadata["source-thumbnail-index"] = str(source_index)
+            print("Using the first source image URL as thumbnail")
+        else:
+            print("Using the encoder's downscaled first frame as thumbnail")
+        
+        # Generate video, optionally streaming ffmpeg's output straight to R2
+        streamed = {}
+        if stream_upload:
+            video_path = "pipe:1"
             
-        finally:
-            os.chdir(original_cwd)
+            async def stream_video(reader, producer_done):
+                streamed["video_url"] = await upload_stream_to_r2(
+                    reader, video_key, producer_done, video_metadata
+                )
+            stdout_consumer = stream_video
+        else:
+            video_path = os.path.join(temp_dir, "output.mp4")
+            stdout_consumer = None
+        
+        # Without a source URL to reuse, the encode also writes the thumbnail
+        thumbnail_path = (
+            None if reuse_source_thumbnail
+            else os.path.join(temp_dir, "thumbnail.jpg")
+        )
+        
+        start_time = time.time()
+        _, generation_time = await generator.generate_video(
+            image_paths=image_paths,
+            durations=durations,
+            audio_path=audio_url,
+            subtitle_path=subtitle_path,
+            output_path=video_path,
+            video_aspect=video_aspect,
+            apply_effects=apply_effects,
+            quality=quality,
+            codec=codec,
+            parallel_clips=parallel_clips,
+            work_dir=temp_dir,
+            stdout_consumer=stdout_consumer,
+            thumbnail_path=thumbnail_path
+        )
+        end_time = time.time()
+        timings["video_generation"] = end_time - start_time
+        
+        print(f"Video generated in {generation_time:.2f} seconds")
+        logger.info(f"Video generation completed in {timings['video_generation']:.2f} seconds")
+        
+        # Upload to R2; video and thumbnail uploads are independent, so they
+        # run together and each records its own duration
+        uploads = {}
+        if not stream_upload:
+            uploads["video"] = _timed(
+                "video_upload_to_r2", upload_to_r2(video_path, video_key, video_metadata), timings
+            )
+        if not reuse_source_thumbnail:
+            uploads["thumbnail"] = _timed(
+                "thumbnail_upload_to_r2", upload_to_r2(thumbnail_path, thumb_key), timings
+            )
+        urls = dict(zip(uploads, await asyncio.gather(*uploads.values())))
+        if cache_commit is not None:
+            await cache_commit
+        
+        video_url = streamed["video_url"] if stream_upload else urls["video"]
+        if not reuse_source_thumbnail:
+            thumb_url = urls["thumbnail"]
+        
+        print("Video generated successfully")
+        logger.info("--- Video Generation Timings Summary ---")
+        for step, duration in timings.items():
+            logger.info(f"{step.replace('_', ' ').title()}: {duration:.2f} seconds")
+        logger.info("----------------------------------------")
+        
+        overall_end_time = time.time() # End timing the entire process
+        total_process_time = overall_end_time - overall_start_time
+        
+        # Calculate total generation time from all individual timings
+        total_video_generation_time = sum(timings.values())
+        
+        logger.info(f"Total process time: {total_process_time:.2f} seconds")
+        logger.info(f"Total effective video generation time (sum of steps): {total_video_generation_time:.2f} seconds")
+        
+        return {
+            "success": True,
+            "video_url": video_url,
+            "thumbnail_url": thumb_url,
+            "duration": total_duration,
+            "generation_time": generation_time,
+            "reused": False,
+            "timings_summary": timings, # Include timings in the result
+            "total_process_time": total_process_time, # Total time for the entire function execution
+            "total_video_generation_time": total_video_generation_time # Sum of all individual timed steps
+        }
 
 
 # ---- 6. Modal Function ----
@@ -512,6 +1372,7 @@ async def generate_optimized_video(
     memory=2048,    # More memory for CPU processing
     retries=0,
     secrets=[modal.Secret.from_name("r2-credentials")],
+    volumes={CACHE_MOUNT: image_cache},
     timeout=900,
     max_containers=20,
 )
@@ -523,10 +1384,16 @@ async def generate_video(
     video_aspect: str = "9:16",
     apply_effects: bool = True,
     quality: str = "low",
+    reuse_source_thumbnail: bool = True,
+    codec: str = "libx264",
+    stream_upload: bool = False,
+    reuse_existing: bool = False,
+    parallel_clips: bool = True,
 ):
     """Modal endpoint for video generation"""
     
-    logger.info("Starting CPU-only video generation")
+    logger.info(f"Starting video generation with {codec}")
+    logger.info(f"Event loop: {asyncio.get_running_loop().__class__.__name__}")
     
     try:
         result = await generate_optimized_video(
@@ -536,7 +1403,12 @@ async def generate_video(
             script=script,
             video_aspect=video_aspect,
             apply_effects=apply_effects,
-            quality=quality
+            quality=quality,
+            reuse_source_thumbnail=reuse_source_thumbnail,
+            codec=codec,
+            stream_upload=stream_upload,
+            reuse_existing=reuse_existing,
+            parallel_clips=parallel_clips
         )
         
         logger.info(f"Video generation completed: {result}")
@@ -550,6 +1422,47 @@ async def generate_video(
         }
 
 
+@app.function(
+    image=gpu_image,
+    gpu="T4",       # NVENC hardware encoder
+    cpu=8.0,        # Preprocessing, effect filters and subtitles stay on CPU
+    memory=2048,
+    retries=0,
+    secrets=[modal.Secret.from_name("r2-credentials")],
+    volumes={CACHE_MOUNT: image_cache},
+    timeout=900,
+    max_containers=20,
+)
+async def generate_video_gpu(
+    image_urls: List[str],
+    audio_url: str,
+    subtitle_url: str,
+    script: str,
+    video_aspect: str = "9:16",
+    apply_effects: bool = True,
+    quality: str = "low",
+    reuse_source_thumbnail: bool = True,
+    stream_upload: bool = False,
+    reuse_existing: bool = False,
+    parallel_clips: bool = True,
+):
+    """Modal endpoint for video generation on a GPU container with NVENC"""
+    return await generate_video.local(
+        image_urls=image_urls,
+        audio_url=audio_url,
+        subtitle_url=subtitle_url,
+        script=script,
+        video_aspect=video_aspect,
+        apply_effects=apply_effects,
+        quality=quality,
+        reuse_source_thumbnail=reuse_source_thumbnail,
+        codec="h264_nvenc",
+        stream_upload=stream_upload,
+        reuse_existing=reuse_existing,
+        parallel_clips=parallel_clips,
+    )
+
+
 # ---- 7. Load Environment Variables ----
 def load_env_file():
     """Load environment variables from .env file"""